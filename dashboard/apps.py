@@ -1,6 +1,30 @@
+import os
+import threading
+
 from django.apps import AppConfig
 
 
+def _warmup_enabled() -> bool:
+    # Opt-in, so migrate, shell, tests and scripts calling django.setup() never load YOLO.
+    # runserver's autoreloader child sets RUN_MAIN; WSGI servers set YOLO_WARMUP=1.
+    # With gunicorn --preload, warm up from a post_fork hook instead: a thread started
+    # in the master can hold the model lock across fork and deadlock the workers.
+    return os.environ.get("RUN_MAIN") == "true" or os.environ.get("YOLO_WARMUP") == "1"
+
+
+def _warm_model():
+    from .yolo_service import warmup
+
+    warmup()
+
+
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registers receivers)
+
+        # Load and prime the model off the request path so the first capture isn't a cold start.
+        if _warmup_enabled():
+            threading.Thread(target=_warm_model, name="yolo-warmup", daemon=True).start()
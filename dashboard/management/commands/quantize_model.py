@@ -0,0 +1,76 @@
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.yolo_service import INT8_MODEL_PATH, MODEL_PATH, _download_model
+
+
+def _time_model(path, runs: int) -> float:
+    """Median milliseconds per single-frame CPU inference."""
+    import onnxruntime
+
+    session = onnxruntime.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+    model_input = session.get_inputs()[0]
+    # Dynamic axes show up as names/None; time a single 640x640 frame for those.
+    defaults = (1, 3, 640, 640)
+    shape = [dim if isinstance(dim, int) and dim > 0 else defaults[i] for i, dim in enumerate(model_input.shape)]
+    frame = np.random.default_rng(0).random(shape, dtype=np.float32)
+
+    session.run(None, {model_input.name: frame})  # warm-up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, {model_input.name: frame})
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+class Command(BaseCommand):
+    help = "Quantize the YOLO ONNX weights to INT8, keeping the result only if it is faster on this CPU."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Overwrite an existing INT8 model.")
+        parser.add_argument("--runs", type=int, default=20, help="Timed inferences per model.")
+        parser.add_argument(
+            "--keep-slower", action="store_true", help="Install the INT8 model even if it benchmarks slower."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError as exc:
+            raise CommandError(f"onnxruntime quantization tools are unavailable: {exc}")
+
+        if INT8_MODEL_PATH.exists() and not options["force"]:
+            raise CommandError(f"{INT8_MODEL_PATH} already exists; pass --force to rebuild it.")
+
+        _download_model()
+        candidate = INT8_MODEL_PATH.with_suffix(".candidate.onnx")
+        try:
+            # QUInt8 weights: ONNX Runtime's CPU ConvInteger kernel has no signed-weight variant.
+            quantize_dynamic(str(MODEL_PATH), str(candidate), weight_type=QuantType.QUInt8)
+
+            # get_model() prefers the INT8 file whenever it exists, and dynamic ConvInteger
+            # models are often slower than FP32 on CPUs without VNNI/dotprod, so measure first.
+            fp32_ms = _time_model(MODEL_PATH, options["runs"])
+            int8_ms = _time_model(candidate, options["runs"])
+            self.stdout.write(f"FP32 {fp32_ms:.1f} ms/frame, INT8 {int8_ms:.1f} ms/frame")
+
+            if int8_ms >= fp32_ms and not options["keep_slower"]:
+                INT8_MODEL_PATH.unlink(missing_ok=True)
+                raise CommandError(
+                    "INT8 model is not faster than FP32 on this machine; keeping FP32. "
+                    "Pass --keep-slower to install it anyway."
+                )
+
+            os.replace(candidate, INT8_MODEL_PATH)
+        finally:
+            candidate.unlink(missing_ok=True)
+
+        fp32_mb = MODEL_PATH.stat().st_size / 1e6
+        int8_mb = INT8_MODEL_PATH.stat().st_size / 1e6
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {INT8_MODEL_PATH} ({fp32_mb:.1f} MB -> {int8_mb:.1f} MB). Restart the service to load it."
+        ))
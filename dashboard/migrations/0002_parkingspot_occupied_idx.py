@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkingspot',
+            index=models.Index(condition=models.Q(('is_occupied', True)), fields=['is_occupied'], name='ps_occupied_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_timestamp_index(apps, schema_editor):
+    # AnalyticsData is append-only and ordered by timestamp, so PostgreSQL gets a
+    # BRIN index. Other backends (SQLite in development) fall back to a B-tree.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX ad_ts_brin ON dashboard_analyticsdata '
+            'USING BRIN ("timestamp") WITH (pages_per_range = 32)'
+        )
+    else:
+        schema_editor.execute('CREATE INDEX ad_ts_brin ON dashboard_analyticsdata ("timestamp")')
+
+
+def drop_timestamp_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS ad_ts_brin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_parkingspot_occupied_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_timestamp_index, drop_timestamp_index),
+    ]
@@ -0,0 +1,47 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def populate_time_buckets(apps, schema_editor):
+    AnalyticsData = apps.get_model('dashboard', 'AnalyticsData')
+    rows = list(AnalyticsData.objects.all())
+    for row in rows:
+        row.ts_hour = row.timestamp.replace(minute=0, second=0, microsecond=0)
+        row.ts_day = row.timestamp.date()
+    AnalyticsData.objects.bulk_update(rows, ['ts_hour', 'ts_day'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_analyticsdata_timestamp_brin'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analyticsdata',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='analyticsdata',
+            name='ts_hour',
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='analyticsdata',
+            name='ts_day',
+            field=models.DateField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_time_buckets, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='analyticsdata',
+            name='ts_hour',
+            field=models.DateTimeField(db_index=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='analyticsdata',
+            name='ts_day',
+            field=models.DateField(db_index=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def ensure_timestamp_index(apps, schema_editor):
+    # 0003 created ad_ts_brin outside the migration state, so SQLite's table rebuild in
+    # 0004 silently dropped it. Recreate it where missing; now that the index is part of
+    # the model state, later rebuilds carry it over.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS ad_ts_brin ON dashboard_analyticsdata '
+            'USING BRIN ("timestamp") WITH (pages_per_range = 32)'
+        )
+    else:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS ad_ts_brin ON dashboard_analyticsdata ("timestamp")')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_analyticsdata_time_buckets'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(ensure_timestamp_index, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='analyticsdata',
+                    index=models.Index(fields=['timestamp'], name='ad_ts_brin'),
+                ),
+            ],
+        ),
+    ]
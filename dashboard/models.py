@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class ParkingZone(models.Model):
     name = models.CharField(max_length=50) # e.g., "Zone A"
@@ -8,6 +10,11 @@ class ParkingZone(models.Model):
     def __str__(self):
         return self.name
 
+class ParkingSpotManager(models.Manager):
+    # Spots are almost always shown with their zone name, so join it up front (avoids N+1)
+    def get_queryset(self):
+        return super().get_queryset().select_related('zone')
+
 class ParkingSpot(models.Model):
     spot_number = models.CharField(max_length=10) # e.g., "203"
     zone = models.ForeignKey(ParkingZone, on_delete=models.CASCADE)
@@ -15,11 +22,46 @@ class ParkingSpot(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     sensor_id = models.CharField(max_length=50, blank=True, null=True) # For RPi integration
 
+    objects = ParkingSpotManager()
+
+    class Meta:
+        indexes = [
+            # Partial index: occupied spots are the minority, keeps the dashboard count cheap
+            models.Index(fields=['is_occupied'], condition=Q(is_occupied=True), name='ps_occupied_idx'),
+        ]
+
     def __str__(self):
         return f"{self.spot_number} - {'Occupied' if self.is_occupied else 'Free'}"
 
+class AnalyticsDataQuerySet(models.QuerySet):
+    # bulk_create skips save(), so fill the time buckets here too
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_time_buckets()
+        return super().bulk_create(objs, *args, **kwargs)
+
 class AnalyticsData(models.Model):
     # Stores historical data for the line chart
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     occupancy_rate = models.IntegerField() # 0-100
-    accuracy_score = models.FloatField(default=0.0)
\ No newline at end of file
+    accuracy_score = models.FloatField(default=0.0)
+    # Pre-truncated buckets so chart queries group on an indexed column
+    ts_hour = models.DateTimeField(db_index=True, editable=False)
+    ts_day = models.DateField(db_index=True, editable=False)
+
+    objects = AnalyticsDataQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # BRIN on PostgreSQL, B-tree elsewhere; created by migrations 0003/0005
+            models.Index(fields=['timestamp'], name='ad_ts_brin'),
+        ]
+
+    def fill_time_buckets(self):
+        self.ts_hour = self.timestamp.replace(minute=0, second=0, microsecond=0)
+        self.ts_day = self.timestamp.date()
+
+    def save(self, *args, **kwargs):
+        self.fill_time_buckets()
+        super().save(*args, **kwargs)
@@ -0,0 +1,101 @@
+"""Single-pass YOLO preprocessing (letterbox, BGR->RGB, HWC->CHW, /255) compiled with numba."""
+
+import os
+from typing import Sequence, Tuple
+
+import numba
+import numpy as np
+import torch
+from numba import njit, prange
+from ultralytics.models.yolo.detect import DetectionPredictor
+
+PAD_VALUE = 114.0  # matches Ultralytics' LetterBox padding
+
+# The kernel runs on yolo_service's daemon batch thread. With numba's default TBB layer,
+# a process that has launched it from there hangs at interpreter exit (runserver can't
+# reload, gunicorn workers need SIGKILL). The workqueue layer exits cleanly and is fine
+# for a kernel only ever called from that one thread. Must be set before the first launch.
+if "NUMBA_THREADING_LAYER" not in os.environ:
+    numba.config.THREADING_LAYER = "workqueue"
+
+
+def letterbox_params(shape: Sequence[int], new_shape: Sequence[int]) -> Tuple[int, int, int, int]:
+    """Return (top, left, resized_h, resized_w), rounded the same way as LetterBox(auto=False)."""
+    h, w = shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_w, new_h = round(w * r), round(h * r)
+    top = round((new_shape[0] - new_h) / 2 - 0.1)
+    left = round((new_shape[1] - new_w) / 2 - 0.1)
+    return top, left, new_h, new_w
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def letterbox_into(src, out, top, left, new_h, new_w):
+    """Resize (bilinear, OpenCV pixel centres), pad, BGR->RGB, HWC->CHW and /255 in one pass.
+
+    src is an (H, W, 3) uint8 BGR frame; out is a (3, out_h, out_w) float32 view.
+    """
+    h, w = src.shape[0], src.shape[1]
+    out_h, out_w = out.shape[1], out.shape[2]
+    scale_y = h / new_h
+    scale_x = w / new_w
+    inv = np.float32(1.0 / 255.0)
+    pad = np.float32(PAD_VALUE / 255.0)
+
+    for y in prange(out_h):
+        uy = y - top
+        if uy < 0 or uy >= new_h:
+            for x in range(out_w):
+                for c in range(3):
+                    out[c, y, x] = pad
+            continue
+
+        sy = max((uy + 0.5) * scale_y - 0.5, 0.0)
+        y0 = min(int(sy), h - 1)
+        y1 = min(y0 + 1, h - 1)
+        fy = sy - y0
+
+        for x in range(out_w):
+            ux = x - left
+            if ux < 0 or ux >= new_w:
+                for c in range(3):
+                    out[c, y, x] = pad
+                continue
+
+            sx = max((ux + 0.5) * scale_x - 0.5, 0.0)
+            x0 = min(int(sx), w - 1)
+            x1 = min(x0 + 1, w - 1)
+            fx = sx - x0
+
+            for c in range(3):
+                ch = 2 - c  # BGR -> RGB
+                top_row = src[y0, x0, ch] * (1.0 - fx) + src[y0, x1, ch] * fx
+                bottom_row = src[y1, x0, ch] * (1.0 - fx) + src[y1, x1, ch] * fx
+                out[c, y, x] = (top_row * (1.0 - fy) + bottom_row * fy) * inv
+
+
+class FusedDetectionPredictor(DetectionPredictor):
+    """DetectionPredictor whose preprocess() runs the fused letterbox kernel."""
+
+    _buffer = None
+
+    def preprocess(self, im):
+        # Tensors are already preprocessed; rect/auto letterboxing (PyTorch or dynamic
+        # ONNX weights) and scale_fill produce other shapes, so leave those to Ultralytics.
+        pt = getattr(self.model, "format", None) == "pt" or getattr(self.model, "pt", False)
+        auto = self.args.rect and (pt or getattr(self.model, "dynamic", False))
+        if isinstance(im, torch.Tensor) or auto or getattr(self, "scale_fill", False):
+            return super().preprocess(im)
+
+        out_h, out_w = self.imgsz
+        shape = (len(im), 3, out_h, out_w)
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.float32)
+
+        for i, frame in enumerate(im):
+            top, left, new_h, new_w = letterbox_params(frame.shape, (out_h, out_w))
+            letterbox_into(np.ascontiguousarray(frame), self._buffer[i], top, left, new_h, new_w)
+
+        # On CPU the tensor aliases the buffer; it is consumed before the next batch overwrites it.
+        batch = torch.from_numpy(self._buffer).to(self.device)
+        return batch.half() if self.model.fp16 else batch
@@ -0,0 +1,25 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ParkingSpot
+
+DASHBOARD_OCCUPANCY_KEY = "dashboard_occupancy"
+# Inference results go stale; after this the dashboard falls back to the spot table.
+LATEST_OCCUPANCY_TIMEOUT = 300  # seconds
+
+
+def latest_occupancy_key(zone_id=None) -> str:
+    return f"occupancy:{zone_id or 'global'}:latest"
+
+
+@receiver(post_save, sender=ParkingSpot)
+@receiver(post_delete, sender=ParkingSpot)
+def invalidate_dashboard_occupancy(sender, **kwargs):
+    """Drop the cached spot counts and latest stats whenever a spot changes."""
+    instance = kwargs["instance"]
+    cache.delete_many([
+        DASHBOARD_OCCUPANCY_KEY,
+        latest_occupancy_key(instance.zone_id),
+        latest_occupancy_key(),
+    ])
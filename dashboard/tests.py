@@ -1,3 +1,505 @@
-from django.test import TestCase
+import fcntl
+import importlib.util
+import os
+import queue
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+import torch
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import yolo_service
+from .models import AnalyticsData, ParkingSpot, ParkingZone
+from .signals import DASHBOARD_OCCUPANCY_KEY, latest_occupancy_key
+from .views import _store_latest_stats, _store_preview
+
+
+class _FakeModel:
+    """Stands in for YOLO: records batch sizes and returns empty results."""
+
+    names = {0: "empty", 1: "occupied"}
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def predict(self, source, **kwargs):
+        with self.lock:
+            self.batch_sizes.append(len(source))
+        return [
+            SimpleNamespace(names=self.names, boxes=None, plot=lambda frame=frame: frame)
+            for frame in source
+        ]
+
+
+def _isolate_batch_worker(test):
+    """Give the test its own queue and worker, and stop that worker before the queue is restored."""
+    patcher = mock.patch.multiple(yolo_service, _batch_queue=queue.Queue(), _batch_worker=None)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    test.addCleanup(yolo_service._stop_batch_worker, 5)
+
+
+class BatchInferenceTests(SimpleTestCase):
+    def setUp(self):
+        _isolate_batch_worker(self)
+
+    def _run_concurrently(self, batch_limit, count=8):
+        model = _FakeModel()
+        with mock.patch.object(yolo_service, "_model", model), \
+                mock.patch.object(yolo_service, "_batch_limit", batch_limit), \
+                mock.patch.object(yolo_service, "_label_kinds", None), \
+                mock.patch.object(yolo_service, "BATCH_MAX_WAIT", 0.05):
+            yolo_service._start_batch_worker()
+            frames = [np.full((32, 48, 3), i, dtype=np.uint8) for i in range(count)]
+            futures = [None] * count
+
+            def submit(i):
+                futures[i] = yolo_service.submit(frames[i])
+
+            threads = [threading.Thread(target=submit, args=(i,)) for i in range(count)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results = [future.result(timeout=5) for future in futures]
+        return model, results
+
+    def test_concurrent_frames_respect_static_batch(self):
+        model, results = self._run_concurrently(batch_limit=1)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(set(model.batch_sizes), {1})
+
+    def test_concurrent_frames_share_dynamic_batch(self):
+        model, results = self._run_concurrently(batch_limit=16)
+        self.assertEqual(sum(model.batch_sizes), 8)
+        self.assertLessEqual(max(model.batch_sizes), 16)
+        for annotated, stats in results:
+            self.assertTrue(annotated.startswith(b"\xff\xd8"))
+            self.assertEqual(stats["total_spaces"], 0)
+
+    def test_stop_sentinel_finishes_queued_frames_then_exits(self):
+        model = _FakeModel()
+        with mock.patch.object(yolo_service, "_model", model), \
+                mock.patch.object(yolo_service, "_batch_limit", 16), \
+                mock.patch.object(yolo_service, "_label_kinds", None):
+            yolo_service._start_batch_worker()
+            future = yolo_service.submit(np.zeros((32, 48, 3), dtype=np.uint8))
+            yolo_service._stop_batch_worker(timeout=5)
+            self.assertFalse(yolo_service._batch_worker.is_alive())
+            self.assertEqual(future.result(timeout=0)[1]["total_spaces"], 0)
+
+
+class _FakeV4L2Device:
+    """Yields numbered frames; device 0 is missing like a Pi with only /dev/video1."""
+
+    def __init__(self, device_id):
+        if device_id == 0:
+            raise OSError("No such device")
+        self.served = 0
+
+    @classmethod
+    def from_id(cls, device_id):
+        return cls(device_id)
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def fileno(self):
+        return 99
+
+    video_capture = SimpleNamespace(set_format=lambda *args: None)
+
+    def __iter__(self):
+        while True:
+            self.served += 1
+            yield f"frame-{self.served}".encode()
+
+
+class VideoStreamTests(SimpleTestCase):
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_path = Path(lock_dir.name) / "camera.lock"
+        patcher = mock.patch.multiple(
+            yolo_service,
+            V4L2Device=_FakeV4L2Device,
+            CAMERA_LOCK_PATH=self.lock_path,
+            CAMERA_LOCK_TIMEOUT=0.2,
+            STREAM_IDLE_TIMEOUT=0.1,
+            _video_stream=None,
+            _video_stream_timer=None,
+            _camera_lock_file=None,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(yolo_service._close_idle_stream)
+
+    def _capture(self):
+        return yolo_service._first_capture([yolo_service._capture_with_stream])
+
+    def _locked_by_other_process(self):
+        # flock locks belong to the open file, so a second open() acts like another worker
+        other = open(self.lock_path, "a")
+        self.addCleanup(other.close)
+        try:
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(other, fcntl.LOCK_UN)
+        return False
+
+    def test_stale_buffers_are_discarded_and_video1_is_tried(self):
+        queued = iter([True, True, True])  # three buffers filled while idle
+
+        def fake_select(rlist, wlist, xlist, timeout):
+            return ([rlist[0]] if next(queued, False) else []), [], []
+
+        with mock.patch.object(yolo_service.select, "select", fake_select):
+            data = self._capture()
+            self.assertEqual(yolo_service._video_stream.device_id, 1)
+
+        self.assertEqual(data, b"frame-4")
+
+    def test_idle_stream_releases_camera_for_other_workers(self):
+        with mock.patch.object(yolo_service.select, "select", lambda *args: ([], [], [])):
+            self._capture()
+            self.assertTrue(self._locked_by_other_process())
+            self.assertTrue(yolo_service._probe_cameras())
+
+            time.sleep(0.3)
+            self.assertIsNone(yolo_service._video_stream)
+            self.assertFalse(self._locked_by_other_process())
+
+    def test_capture_waits_for_camera_held_by_another_worker(self):
+        self.lock_path.touch()
+        other = open(self.lock_path, "a")
+        self.addCleanup(other.close)
+        fcntl.flock(other, fcntl.LOCK_EX)
+
+        self.assertTrue(yolo_service._camera_locked_elsewhere())
+        with self.assertRaisesMessage(RuntimeError, "busy in another worker"):
+            self._capture()
+
+
+def _with_orientation(jpeg: bytes, orientation: int) -> bytes:
+    """Insert a big-endian EXIF APP1 segment carrying just an Orientation tag."""
+    ifd = struct.pack(">H", 1) + struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack(">I", 0)
+    tiff = b"MM" + struct.pack(">HI", 42, 8) + ifd
+    payload = b"Exif\x00\x00" + tiff
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + jpeg[2:]
+
+
+class DecodeImageTests(SimpleTestCase):
+    def setUp(self):
+        frame = np.zeros((100, 200, 3), dtype=np.uint8)
+        self.jpeg = cv2.imencode(".jpg", frame)[1].tobytes()
+        # Stand-in for TurboJPEG: decodes without looking at EXIF, like the real one.
+        self.turbo = mock.Mock()
+        self.turbo.decode.side_effect = lambda data, pixel_format: cv2.imdecode(
+            np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+        )
+
+    def test_orientation_tag_is_read(self):
+        self.assertEqual(yolo_service._jpeg_orientation(self.jpeg), 1)
+        self.assertEqual(yolo_service._jpeg_orientation(_with_orientation(self.jpeg, 6)), 6)
+
+    def test_rotated_jpeg_keeps_exif_orientation(self):
+        with mock.patch.object(yolo_service, "_turbojpeg", self.turbo), \
+                mock.patch.object(yolo_service, "TJPF_BGR", 0, create=True):
+            upright = yolo_service._decode_image(self.jpeg)
+            rotated = yolo_service._decode_image(_with_orientation(self.jpeg, 6))
+
+        self.assertEqual(upright.shape, (100, 200, 3))
+        self.assertEqual(rotated.shape, (200, 100, 3))
+        self.assertEqual(self.turbo.decode.call_count, 1)
+
+
+class DownloadModelTests(SimpleTestCase):
+    payload = bytes(range(256)) * 64
+
+    def _fake_get(self, *args, **kwargs):
+        payload = self.payload
+
+        def iter_content(chunk_size):
+            for start in range(0, len(payload), 1024):
+                time.sleep(0.001)  # let concurrent downloads interleave
+                yield payload[start:start + 1024]
+
+        return SimpleNamespace(
+            raise_for_status=lambda: None,
+            headers={"content-length": str(len(payload))},
+            iter_content=iter_content,
+        )
+
+    def _patched(self, model_dir):
+        model_dir = Path(model_dir)
+        return mock.patch.multiple(
+            yolo_service,
+            MODEL_DIR=model_dir,
+            MODEL_PATH=model_dir / yolo_service.MODEL_FILENAME,
+        )
+
+    def test_concurrent_downloads_produce_one_complete_file(self):
+        with tempfile.TemporaryDirectory() as model_dir, self._patched(model_dir), \
+                mock.patch.object(yolo_service.requests, "get", self._fake_get):
+            errors = []
+
+            def download():
+                try:
+                    yolo_service._download_model()
+                except Exception as exc:  # noqa: B902
+                    errors.append(exc)
+
+            threads = [threading.Thread(target=download) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            self.assertEqual(yolo_service.MODEL_PATH.read_bytes(), self.payload)
+            self.assertEqual(sorted(p.name for p in Path(model_dir).iterdir()), [yolo_service.MODEL_FILENAME])
+
+    def test_checksum_mismatch_leaves_no_model(self):
+        with tempfile.TemporaryDirectory() as model_dir, self._patched(model_dir), \
+                mock.patch.object(yolo_service.requests, "get", self._fake_get), \
+                mock.patch.object(yolo_service, "MODEL_SHA256", "0" * 64):
+            with self.assertRaises(RuntimeError):
+                yolo_service._download_model()
+            self.assertEqual(list(Path(model_dir).iterdir()), [])
+
+
+class GetModelTests(SimpleTestCase):
+    def setUp(self):
+        _isolate_batch_worker(self)
+
+    def test_concurrent_callers_load_model_once(self):
+        loads = []
+
+        def slow_yolo(path, task):
+            loads.append(path)
+            time.sleep(0.05)
+            return _FakeModel()
+
+        with mock.patch.multiple(
+            yolo_service,
+            _model=None,
+            YOLO=slow_yolo,
+            _download_model=lambda: None,
+            _read_batch_limit=lambda weights: 1,
+        ):
+            errors = []
+
+            def load():
+                try:
+                    yolo_service.get_model()
+                except Exception as exc:  # noqa: B902
+                    errors.append(exc)
+
+            threads = [threading.Thread(target=load) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            self.assertEqual(len(loads), 1)
+            self.assertTrue(yolo_service._batch_worker.is_alive())
+
+
+class WarmupTests(SimpleTestCase):
+    def test_warmup_is_opt_in(self):
+        from .apps import _warmup_enabled
+
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(_warmup_enabled())
+        with mock.patch.dict(os.environ, {"RUN_MAIN": "true"}, clear=True):
+            self.assertTrue(_warmup_enabled())
+        with mock.patch.dict(os.environ, {"YOLO_WARMUP": "1"}, clear=True):
+            self.assertTrue(_warmup_enabled())
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PreviewViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('viewer', password='secret')
+        self.client.force_login(user)
+
+    def test_preview_is_served_from_cache(self):
+        url = _store_preview(b'\xff\xd8jpeg')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(response.content, b'\xff\xd8jpeg')
+
+    def test_expired_preview_is_404(self):
+        url = _store_preview(b'\xff\xd8jpeg')
+        cache.clear()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AnalyticsBucketTests(TestCase):
+    def test_save_and_bulk_create_fill_buckets(self):
+        stamp = timezone.now().replace(hour=10, minute=42, second=7)
+        saved = AnalyticsData.objects.create(occupancy_rate=40, timestamp=stamp)
+        AnalyticsData.objects.bulk_create([AnalyticsData(occupancy_rate=60, timestamp=stamp)])
+
+        for row in (saved, AnalyticsData.objects.order_by('-id').first()):
+            self.assertEqual(row.ts_hour, stamp.replace(minute=0, second=0, microsecond=0))
+            self.assertEqual(row.ts_day, stamp.date())
+
+    def test_stats_only_cover_the_last_day(self):
+        now = timezone.now()
+        AnalyticsData.objects.bulk_create([
+            AnalyticsData(occupancy_rate=20, timestamp=now - timedelta(days=2)),
+            AnalyticsData(occupancy_rate=40, timestamp=now),
+            AnalyticsData(occupancy_rate=60, timestamp=now),
+        ])
+        self.client.force_login(User.objects.create_user('viewer', password='secret'))
+
+        data = self.client.get(reverse('get_stats')).json()
+        self.assertEqual(data['data'], [50])
+        self.assertEqual(data['labels'], [now.strftime('%H:00')])
+
+
+class AnalyticsIndexTests(TestCase):
+    def test_timestamp_index_survives_migrations(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, AnalyticsData._meta.db_table)
+        self.assertIn('ad_ts_brin', constraints)
+        self.assertEqual(constraints['ad_ts_brin']['columns'], ['timestamp'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class OccupancyCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.zone = ParkingZone.objects.create(name='Zone A')
+        ParkingSpot.objects.create(spot_number='1', zone=self.zone, is_occupied=True)
+        self.spot = ParkingSpot.objects.create(spot_number='2', zone=self.zone)
+        self.client.force_login(User.objects.create_user('viewer', password='secret'))
+
+    def test_dashboard_counts_are_cached_until_a_spot_changes(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['occupied_spots'], 1)
+        self.assertEqual(cache.get(DASHBOARD_OCCUPANCY_KEY), {'total': 2, 'occupied': 1})
+
+        self.spot.is_occupied = True
+        self.spot.save()
+        self.assertIsNone(cache.get(DASHBOARD_OCCUPANCY_KEY))
+        self.assertEqual(self.client.get(reverse('dashboard')).context['occupied_spots'], 2)
+
+    def test_latest_stats_expire_on_spot_update(self):
+        stats = {'occupied': 3, 'empty': 1, 'total_spaces': 4, 'occupancy_rate': 75, 'lots_detected': 0}
+        _store_latest_stats(stats, 'upload')
+        self.assertEqual(self.client.get(reverse('dashboard')).context['occupancy_rate'], 75)
+
+        self.spot.delete()
+        self.assertIsNone(cache.get(latest_occupancy_key()))
+        self.assertEqual(self.client.get(reverse('dashboard')).context['occupancy_rate'], 100)
+
+
+class OccupancyStatsTests(SimpleTestCase):
+    names = {0: 'empty', 1: 'occupied', 2: 'parking lot', 3: 'car'}
+
+    def _loop_counts(self, class_ids):
+        # The per-detection loop that _extract_occupancy_stats used to run
+        counts = {'occupied': 0, 'empty': 0, 'lots': 0}
+        for cid in class_ids:
+            label = self.names[int(cid)].lower()
+            if 'empty' in label:
+                counts['empty'] += 1
+            elif 'occup' in label:
+                counts['occupied'] += 1
+            elif 'lot' in label:
+                counts['lots'] += 1
+        return counts
+
+    def test_bincount_matches_loop(self):
+        class_ids = np.random.default_rng(0).integers(0, 4, 500).astype(np.float32)
+        result = SimpleNamespace(names=self.names, boxes=SimpleNamespace(cls=torch.from_numpy(class_ids)))
+
+        with mock.patch.object(yolo_service, '_label_kinds', None):
+            stats = yolo_service._extract_occupancy_stats(result)
+
+        expected = self._loop_counts(class_ids)
+        self.assertEqual(stats['occupied'], expected['occupied'])
+        self.assertEqual(stats['empty'], expected['empty'])
+        self.assertEqual(stats['lots_detected'], expected['lots'])
+        self.assertEqual(stats['total_spaces'], expected['occupied'] + expected['empty'])
+
+
+@skipUnless(importlib.util.find_spec('numba'), 'numba is not installed')
+class FusedPreprocessTests(SimpleTestCase):
+    def test_letterbox_matches_opencv(self):
+        from .preprocess import PAD_VALUE, letterbox_into, letterbox_params
+
+        rng = np.random.default_rng(0)
+        for shape in [(720, 1280, 3), (480, 640, 3), (300, 200, 3), (640, 640, 3)]:
+            frame = cv2.GaussianBlur(rng.integers(0, 255, shape, dtype=np.uint8), (5, 5), 0)
+            top, left, new_h, new_w = letterbox_params(shape, (640, 640))
+
+            expected = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+            expected = cv2.copyMakeBorder(
+                expected, top, 640 - new_h - top, left, 640 - new_w - left,
+                cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3,
+            )
+            expected = expected[..., ::-1].transpose(2, 0, 1).astype(np.float32) / 255
+
+            out = np.empty((3, 640, 640), dtype=np.float32)
+            letterbox_into(frame, out, top, left, new_h, new_w)
+            # OpenCV rounds the resized pixels to uint8; the kernel keeps them as floats
+            self.assertLessEqual(np.abs(out - expected).max(), 1 / 255, shape)
+
+    def test_process_exits_after_fused_kernel_on_batch_thread(self):
+        # The kernel runs on the daemon batch thread, which is still blocked on the queue at
+        # exit; with numba's TBB layer that hung interpreter shutdown.
+        script = (
+            "import django, numpy as np\n"
+            "from types import SimpleNamespace\n"
+            "django.setup()\n"
+            "from dashboard import yolo_service\n"
+            "from dashboard.preprocess import letterbox_into, letterbox_params\n"
+            "class Model:\n"
+            "    names = {0: 'empty'}\n"
+            "    def predict(self, source, **kwargs):\n"
+            "        out = np.empty((3, 640, 640), np.float32)\n"
+            "        for frame in source:\n"
+            "            letterbox_into(frame, out, *letterbox_params(frame.shape, (640, 640)))\n"
+            "        return [SimpleNamespace(names=self.names, boxes=None, plot=lambda f=f: f) for f in source]\n"
+            "yolo_service._model = Model()\n"
+            "yolo_service._start_batch_worker()\n"
+            "yolo_service.submit(np.zeros((48, 64, 3), np.uint8)).result(timeout=60)\n"
+        )
+        env = {k: v for k, v in os.environ.items() if k != 'NUMBA_THREADING_LAYER'}
+        env['DJANGO_SETTINGS_MODULE'] = 'core.settings'
+        proc = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, timeout=60,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr.decode())
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('cameras/', views.cameras_view, name='cameras'),
+    path('cameras/preview/<uuid:pk>/', views.preview_view, name='camera_preview'),
     path('login/', views.login_view, name='login'),
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
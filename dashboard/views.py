@@ -3,32 +3,55 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
-from django.http import JsonResponse
+from django.db.models import Avg, Count, Q
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
 from django.utils import timezone
 from .models import ParkingSpot, ParkingZone, AnalyticsData
-from .yolo_service import MODEL_PATH, run_inference, camera_available, capture_frame, as_data_uri
+from .signals import DASHBOARD_OCCUPANCY_KEY, LATEST_OCCUPANCY_TIMEOUT, latest_occupancy_key
+from .yolo_service import MODEL_PATH, run_inference, submit, camera_available, capture_frame_array
 import random # Simulating ML data for demo
+import uuid
+from datetime import timedelta
 
+PREVIEW_TIMEOUT = 15 * 60  # seconds an annotated image stays downloadable
 
-def _store_latest_stats(stats: dict, source: str) -> None:
+
+def _store_latest_stats(stats: dict, source: str, zone_id=None) -> None:
     """Persist the most recent occupancy stats for the dashboard card."""
     payload = {
         **stats,
         "source": source,
         "updated_at": timezone.now().isoformat(),
     }
-    cache.set("latest_occupancy_stats", payload, timeout=None)
+    cache.set(latest_occupancy_key(zone_id), payload, timeout=LATEST_OCCUPANCY_TIMEOUT)
+    cache.delete(DASHBOARD_OCCUPANCY_KEY)
+
+
+def _load_occupancy_counts() -> dict:
+    return ParkingSpot.objects.aggregate(
+        total=Count('id'),
+        occupied=Count('id', filter=Q(is_occupied=True)),
+    )
+
+def _store_preview(image_bytes: bytes) -> str:
+    """Cache the annotated JPEG and return a short-lived URL for it."""
+    preview_id = uuid.uuid4()
+    cache.set(f"preview:{preview_id}", image_bytes, timeout=PREVIEW_TIMEOUT)
+    return reverse('camera_preview', args=[preview_id])
 
 @login_required
 def dashboard_view(request):
     # Determine stats
-    total_spots = ParkingSpot.objects.count()
-    occupied = ParkingSpot.objects.filter(is_occupied=True).count()
+    # Spot occupancy only changes on sensor/inference updates, which invalidate this key.
+    counts = cache.get_or_set(DASHBOARD_OCCUPANCY_KEY, _load_occupancy_counts, timeout=30)
+    total_spots = counts['total']
+    occupied = counts['occupied']
     
     # Calculate percentage for the donut chart
     occupancy_rate = int((occupied / total_spots) * 100) if total_spots > 0 else 0
 
-    latest_stats = cache.get("latest_occupancy_stats")
+    latest_stats = cache.get(latest_occupancy_key())
     if latest_stats:
         total_spots = latest_stats.get("total_spaces", total_spots)
         occupied = latest_stats.get("occupied", occupied)
@@ -53,14 +76,14 @@ def cameras_view(request):
     result_image = None
     error = None
     source = None
-    camera_ready = camera_available()
+    camera_ready = None
 
     if request.method == 'POST':
         if 'capture' in request.POST:
             try:
-                captured_bytes = capture_frame()
-                annotated, stats = run_inference(captured_bytes)
-                result_image = as_data_uri(annotated)
+                captured_frame = capture_frame_array()
+                annotated, stats = run_inference(captured_frame)
+                result_image = _store_preview(annotated)
                 source = 'capture'
                 _store_latest_stats(stats, source)
             except Exception as exc: # noqa: B902 (broad for user feedback)
@@ -68,8 +91,11 @@ def cameras_view(request):
         elif request.FILES.get('image'):
             try:
                 uploaded_bytes = request.FILES['image'].read()
-                annotated, stats = run_inference(uploaded_bytes)
-                result_image = as_data_uri(annotated)
+                # Inference runs on the batch worker while this thread probes the cameras
+                pending = submit(uploaded_bytes)
+                camera_ready = camera_available()
+                annotated, stats = pending.result()
+                result_image = _store_preview(annotated)
                 source = 'upload'
                 _store_latest_stats(stats, source)
             except Exception as exc: # noqa: B902
@@ -77,6 +103,10 @@ def cameras_view(request):
         else:
             error = "Please upload an image or use the capture option."
 
+    if camera_ready is None:
+        # Probed after a capture so it never contends with the capture for the device
+        camera_ready = camera_available()
+
     context = {
         'active_segment': 'Cameras',
         'camera_ready': camera_ready,
@@ -87,6 +117,16 @@ def cameras_view(request):
     }
     return render(request, 'cameras.html', context)
 
+@login_required
+def preview_view(request, pk):
+    image_bytes = cache.get(f"preview:{pk}")
+    if image_bytes is None:
+        raise Http404("Preview expired")
+    response = HttpResponse(image_bytes, content_type='image/jpeg')
+    # Let the browser keep it, so Download still works from an open page after expiry
+    response['Cache-Control'] = f'private, max-age={PREVIEW_TIMEOUT}'
+    return response
+
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('dashboard')
@@ -121,9 +161,25 @@ def logout_view(request):
 
 @login_required
 def get_stats(request):
-    # API for dynamic charts (simulated data for the line chart)
+    # API for dynamic charts: hourly average occupancy over the last 24 hours
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+    hourly = list(
+        AnalyticsData.objects.filter(ts_hour__gte=since)
+        .values('ts_hour')
+        .annotate(avg=Avg('occupancy_rate'))
+        .order_by('-ts_hour')[:24]
+    )
+    if not hourly:
+        # Nothing recorded in the last day, keep the simulated demo series
+        data = {
+            'labels': ['10:00', '11:00', '12:00', '13:00', '14:00'],
+            'data': [10, 25, 60, 40, 75]
+        }
+        return JsonResponse(data)
+
+    hourly.reverse()
     data = {
-        'labels': ['10:00', '11:00', '12:00', '13:00', '14:00'],
-        'data': [10, 25, 60, 40, 75] 
+        'labels': [row['ts_hour'].strftime('%H:%M') for row in hourly],
+        'data': [round(row['avg']) for row in hourly],
     }
     return JsonResponse(data)
\ No newline at end of file
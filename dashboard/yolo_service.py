@@ -1,24 +1,93 @@
-import base64
+import hashlib
 import os
+import queue
+import select
 import shutil
+import struct
 import subprocess
 import tempfile
+import threading
 import time
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # not POSIX; captures are then only serialised within a process
+    fcntl = None
 
 import cv2
 import numpy as np
+import onnxruntime
 import requests
+import torch
 from django.conf import settings
+from django.core.cache import cache
 from ultralytics import YOLO
 
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+
+    _turbojpeg: Optional[TurboJPEG] = TurboJPEG()
+except (ImportError, OSError, RuntimeError):  # PyTurboJPEG or the libturbojpeg shared library is missing
+    _turbojpeg = None
+
+try:
+    from .preprocess import FusedDetectionPredictor
+except ImportError:  # numba not installed, use Ultralytics' own preprocessing
+    FusedDetectionPredictor = None
+
+try:
+    from v4l2py import Device as V4L2Device
+except ImportError:  # not on Linux, or v4l2py not installed
+    V4L2Device = None
+
 MODEL_URL = "https://www.dropbox.com/scl/fi/8n60aqre52ix3gp65t3v0/best.onnx?rlkey=1jniqjxlctut2qopgagsr6lkm&st=ftgl9dsj&dl=1"
 MODEL_FILENAME = "best.onnx"
 MODEL_DIR = settings.BASE_DIR / "content" / "runs" / "detect" / "parking_model" / "weights"
 MODEL_PATH = MODEL_DIR / MODEL_FILENAME
+# Set to the hex digest of the published weights to reject corrupted or swapped downloads.
+MODEL_SHA256: Optional[str] = os.environ.get("YOLO_MODEL_SHA256") or None
+# Produced by `manage.py quantize_model`; preferred over the FP32 weights on CPU when present.
+INT8_MODEL_PATH = MODEL_DIR / "best.int8.onnx"
+# TensorRT engine exported on the deployment host (`yolo export model=best.onnx format=engine`).
+# Building one takes minutes, so it is only ever loaded, never built here.
+ENGINE_MODEL_PATH = MODEL_DIR / "best.engine"
+JPEG_QUALITY = 80
+CAMERA_PROBE_KEY = "camera_probe"
+CAMERA_PROBE_TIMEOUT = 5  # seconds
+STREAM_DEVICES = (0, 1)
+STREAM_MAX_STALE = 8  # upper bound on queued driver buffers discarded before a capture
+STREAM_RESOLUTION = (1280, 720)
+# The camera can only be opened by one process at a time. Captures hold an flock on
+# CAMERA_LOCK_PATH (the warm stream holds it while open), and the stream is released
+# after STREAM_IDLE_TIMEOUT so captures landing on other workers wait briefly instead
+# of finding the device busy.
+CAMERA_LOCK_PATH = MODEL_DIR / "camera.lock"
+CAMERA_LOCK_TIMEOUT = 15  # seconds
+STREAM_IDLE_TIMEOUT = 5  # seconds
+
+# Concurrent requests are micro-batched into a single predict() call, capped at
+# whatever batch size the loaded weights accept (static exports take only 1).
+BATCH_SIZE = 16
+BATCH_MAX_WAIT = 0.01  # seconds
+
+# Detection label categories, indexed by np.bincount in _extract_occupancy_stats.
+KIND_EMPTY, KIND_OCCUPIED, KIND_LOT, KIND_OTHER = range(4)
 
 _model: Optional[YOLO] = None
+_model_lock = threading.Lock()  # startup warm-up and early requests may race to load the model
+_label_kinds: Optional[np.ndarray] = None
+_device = "cpu"
+_batch_limit = 1
+_batch_queue: "queue.Queue[Optional[Tuple[np.ndarray, float, Future]]]" = queue.Queue()
+_STOP_BATCH = None  # queued by _stop_batch_worker(); the worker exits after the batch it ends
+_batch_worker: Optional[threading.Thread] = None
+_video_stream: Optional["_VideoStream"] = None
+_video_stream_timer: Optional[threading.Timer] = None
+_camera_lock = threading.Lock()  # serialises captures between threads of this process
+_camera_lock_file = None  # open while this process holds the cross-process camera flock
 
 
 def _download_model() -> None:
@@ -31,31 +100,189 @@ def _download_model() -> None:
     total_size = int(response.headers.get("content-length", 0))
     chunk_size = 1024 * 256
 
+    # Download next to the target and rename into place, so an interrupted
+    # download never leaves a truncated best.onnx behind. Each process gets its
+    # own temp file because every worker may warm up (and download) at once.
+    digest = hashlib.sha256()
     downloaded = 0
+    with tempfile.NamedTemporaryFile(dir=MODEL_DIR, prefix=f"{MODEL_FILENAME}.", suffix=".part", delete=False) as file:
+        tmp_path = Path(file.name)
     try:
-        with open(MODEL_PATH, "wb") as file:
+        with open(tmp_path, "wb") as file:
             for chunk in response.iter_content(chunk_size):
                 if not chunk:
                     continue
                 file.write(chunk)
+                digest.update(chunk)
                 downloaded += len(chunk)
-                if total_size and downloaded >= total_size:
-                    break
-    except Exception:
-        if MODEL_PATH.exists():
-            MODEL_PATH.unlink()
-        raise
+            file.flush()
+            os.fsync(file.fileno())
+
+        if total_size and downloaded != total_size:
+            raise RuntimeError(f"Model download incomplete: got {downloaded} of {total_size} bytes")
+        if MODEL_SHA256 and digest.hexdigest() != MODEL_SHA256.lower():
+            raise RuntimeError(f"Model checksum mismatch: expected {MODEL_SHA256}, got {digest.hexdigest()}")
+
+        try:
+            os.replace(tmp_path, MODEL_PATH)
+        except OSError:
+            if not MODEL_PATH.exists():  # fine if another worker finished first
+                raise
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _select_weights() -> Tuple[Path, str]:
+    """Pick the fastest available weights and the device to run them on."""
+    if torch.cuda.is_available():
+        if ENGINE_MODEL_PATH.exists():
+            return ENGINE_MODEL_PATH, "cuda:0"
+        # Ultralytics uses the CUDA execution provider for ONNX weights on a CUDA device.
+        # The INT8 model is skipped here: ONNX Runtime has no CUDA ConvInteger kernel.
+        if "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+            return MODEL_PATH, "cuda:0"
+    if INT8_MODEL_PATH.exists():
+        return INT8_MODEL_PATH, "cpu"
+    return MODEL_PATH, "cpu"
+
+
+def _read_batch_limit(weights: Path) -> int:
+    """Largest batch the weights accept: BATCH_SIZE for a dynamic ONNX batch axis, else the fixed size."""
+    if weights.suffix != ".onnx":
+        return 1  # TensorRT engines are exported with a static batch of 1 by default
+
+    session = onnxruntime.InferenceSession(str(weights), providers=["CPUExecutionProvider"])
+    batch_dim = session.get_inputs()[0].shape[0]
+    if isinstance(batch_dim, int) and batch_dim > 0:
+        return min(batch_dim, BATCH_SIZE)
+    return BATCH_SIZE
 
 
 def get_model() -> YOLO:
-    global _model
-    if _model is None:
-        _download_model()
-        _model = YOLO(str(MODEL_PATH), task="detect")
+    global _model, _label_kinds, _device, _batch_limit
+    if _model is None or _batch_worker is None or not _batch_worker.is_alive():
+        with _model_lock:
+            if _model is None:
+                _download_model()
+                weights, _device = _select_weights()
+                model = YOLO(str(weights), task="detect")
+                _batch_limit = _read_batch_limit(weights)
+                _label_kinds = _build_label_kinds(model.names)
+                # Start the worker before publishing _model so the lock-free check above
+                # never sees a model without a worker.
+                _start_batch_worker()
+                _model = model
+            _start_batch_worker()
     return _model
 
 
+def _start_batch_worker() -> None:
+    global _batch_worker
+    if _batch_worker is None or not _batch_worker.is_alive():
+        _batch_worker = threading.Thread(target=_batch_loop, name="yolo-batch", daemon=True)
+        _batch_worker.start()
+
+
+def _stop_batch_worker(timeout: Optional[float] = None) -> None:
+    """Let the batch thread finish the requests queued so far, then exit."""
+    worker = _batch_worker
+    if worker is not None and worker.is_alive():
+        _batch_queue.put(_STOP_BATCH)
+        worker.join(timeout)
+
+
+def _drain_batch() -> list:
+    """Block for one request, then collect more until the batch is full or the wait expires."""
+    items = [_batch_queue.get()]
+    deadline = time.monotonic() + BATCH_MAX_WAIT
+    while len(items) < _batch_limit and items[-1] is not _STOP_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            items.append(_batch_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return items
+
+
+def _batch_loop() -> None:
+    while True:
+        items = _drain_batch()
+        stop = items[-1] is _STOP_BATCH
+        if stop:
+            items.pop()
+
+        # predict() takes a single conf, so requests with different thresholds run separately.
+        by_conf: Dict[float, list] = {}
+        for frame, conf, future in items:
+            if future.set_running_or_notify_cancel():
+                by_conf.setdefault(conf, []).append((frame, future))
+
+        for conf, group in by_conf.items():
+            try:
+                results = _model.predict(
+                    source=[frame for frame, _ in group],
+                    conf=conf,
+                    device=_device,
+                    predictor=FusedDetectionPredictor,
+                )
+            except Exception as exc:  # noqa: B902
+                for _, future in group:
+                    future.set_exception(exc)
+                continue
+
+            for (_, future), result in zip(group, results):
+                try:
+                    future.set_result(_render_result(result))
+                except Exception as exc:  # noqa: B902
+                    future.set_exception(exc)
+
+        if stop:
+            return
+
+
+def _jpeg_orientation(data: bytes) -> int:
+    """Return the EXIF Orientation of a JPEG (1, upright, when absent or unreadable)."""
+    pos = 2  # skip SOI
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xDA:  # start of scan, no more metadata
+            break
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        segment = data[pos + 4:pos + 2 + length]
+        if marker == 0xE1 and segment[:6] == b"Exif\x00\x00":
+            tiff = segment[6:]
+            order = "<" if tiff[:2] == b"II" else ">"
+            try:
+                ifd = struct.unpack(order + "I", tiff[4:8])[0]
+                (entries,) = struct.unpack(order + "H", tiff[ifd:ifd + 2])
+                for i in range(entries):
+                    entry = tiff[ifd + 2 + 12 * i:ifd + 14 + 12 * i]
+                    tag, kind = struct.unpack(order + "HH", entry[:4])
+                    if tag == 0x0112 and kind == 3:  # Orientation, SHORT
+                        return struct.unpack(order + "H", entry[8:10])[0]
+            except struct.error:
+                pass
+            return 1
+        pos += 2 + length
+    return 1
+
+
 def _decode_image(image_bytes: bytes) -> np.ndarray:
+    # libjpeg-turbo handles JPEGs (captures and most uploads); other formats go through OpenCV.
+    # TurboJPEG ignores EXIF orientation, so rotated phone photos are left to cv2.imdecode,
+    # which applies it.
+    if (
+        _turbojpeg is not None
+        and image_bytes[:2] == b"\xff\xd8"
+        and _jpeg_orientation(image_bytes) == 1
+    ):
+        try:
+            return _turbojpeg.decode(image_bytes, pixel_format=TJPF_BGR)
+        except OSError:
+            pass  # corrupt or unusual JPEG, let OpenCV have a go
+
     array = np.frombuffer(image_bytes, np.uint8)
     img = cv2.imdecode(array, cv2.IMREAD_COLOR)
     if img is None:
@@ -63,22 +290,51 @@ def _decode_image(image_bytes: bytes) -> np.ndarray:
     return img
 
 
+def _encode_jpeg(image: np.ndarray) -> bytes:
+    if _turbojpeg is not None:
+        return _turbojpeg.encode(image, quality=JPEG_QUALITY, pixel_format=TJPF_BGR)
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise RuntimeError("Failed to encode image")
+    return encoded.tobytes()
+
+
+def _classify_label(name: str) -> int:
+    label = str(name).lower()
+    if "empty" in label:
+        return KIND_EMPTY
+    if "occup" in label:
+        return KIND_OCCUPIED
+    if "lot" in label:
+        return KIND_LOT
+    return KIND_OTHER
+
+
+def _build_label_kinds(names: Dict[int, str]) -> np.ndarray:
+    """Map each class id to its label kind so detections can be counted in one bincount."""
+    kinds = np.full(max(names, default=-1) + 1, KIND_OTHER, dtype=np.intp)
+    for cid, name in names.items():
+        kinds[int(cid)] = _classify_label(name)
+    return kinds
+
+
 def _extract_occupancy_stats(result) -> Dict[str, int]:
     """Count occupied/empty detections from a YOLO result."""
-    counts = {"occupied": 0, "empty": 0, "lots": 0}
-
     names = getattr(result, "names", {}) or {}
-    boxes = getattr(result, "boxes", None)
-    class_ids = boxes.cls.tolist() if boxes is not None and boxes.cls is not None else []
+    kinds = _label_kinds if _label_kinds is not None else _build_label_kinds(names)
 
-    for cid in class_ids:
-        label = str(names.get(int(cid), "")).lower()
-        if "empty" in label:
-            counts["empty"] += 1
-        elif "occup" in label:
-            counts["occupied"] += 1
-        elif "lot" in label:
-            counts["lots"] += 1
+    tally = np.zeros(4, dtype=np.intp)
+    boxes = getattr(result, "boxes", None)
+    if boxes is not None and boxes.cls is not None and len(kinds):
+        class_ids = boxes.cls.cpu().numpy().astype(np.intp)
+        tally = np.bincount(kinds[class_ids], minlength=4)
+
+    counts = {
+        "occupied": int(tally[KIND_OCCUPIED]),
+        "empty": int(tally[KIND_EMPTY]),
+        "lots": int(tally[KIND_LOT]),
+    }
 
     total_spaces = counts["occupied"] + counts["empty"]
     occupancy_rate = int(round((counts["occupied"] / total_spaces) * 100)) if total_spaces else 0
@@ -92,20 +348,52 @@ def _extract_occupancy_stats(result) -> Dict[str, int]:
     }
 
 
-def run_inference(image_bytes: bytes, conf: float = 0.25) -> Tuple[bytes, Dict[str, int]]:
-    model = get_model()
-    frame = _decode_image(image_bytes)
-    results = model.predict(source=frame, conf=conf)
-    result = results[0]
+def _render_result(result) -> Tuple[bytes, Dict[str, int]]:
     stats = _extract_occupancy_stats(result)
-    plotted = result.plot()
-    ok, encoded = cv2.imencode(".jpg", plotted)
-    if not ok:
-        raise RuntimeError("Failed to encode result image")
-    return encoded.tobytes(), stats
+    return _encode_jpeg(result.plot()), stats
+
+
+def submit(source: Union[bytes, np.ndarray], conf: float = 0.25) -> Future:
+    """Queue a frame for the next inference batch; encoded bytes are decoded in the calling thread."""
+    frame = source if isinstance(source, np.ndarray) else _decode_image(source)
+    get_model()
+    future: Future = Future()
+    _batch_queue.put((frame, conf, future))
+    return future
+
+
+def warmup() -> None:
+    """Load the model and push one blank frame through the batch worker."""
+    blank = np.zeros((640, 640, 3), dtype=np.uint8)
+    submit(blank).result()
+
+
+def run_inference(source: Union[bytes, np.ndarray], conf: float = 0.25) -> Tuple[bytes, Dict[str, int]]:
+    """Run detection on encoded image bytes or an already decoded BGR frame."""
+    return submit(source, conf).result()
 
 
 def camera_available() -> bool:
+    # Opening V4L2 devices is slow, so the probe result is reused for a few seconds.
+    return cache.get_or_set(CAMERA_PROBE_KEY, _probe_cameras, timeout=CAMERA_PROBE_TIMEOUT)
+
+
+def _camera_locked_elsewhere() -> bool:
+    if fcntl is None or _camera_lock_file is not None or not CAMERA_LOCK_PATH.exists():
+        return False
+    with open(CAMERA_LOCK_PATH, "a") as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(file, fcntl.LOCK_UN)
+    return False
+
+
+def _probe_cameras() -> bool:
+    if _video_stream is not None or _camera_locked_elsewhere():
+        return True  # a capture holds the device open, so VideoCapture would fail below
+
     rpicam_exists = shutil.which("rpicam-still") is not None
     if rpicam_exists or shutil.which("fswebcam"):
         return True
@@ -119,7 +407,120 @@ def camera_available() -> bool:
     return False
 
 
-def _capture_with_webcam() -> bytes:
+class _VideoStream:
+    """A V4L2 MJPG stream kept open between captures; frames come straight from mmap'd buffers."""
+
+    def __init__(self, device_id: int):
+        self.device_id = device_id
+        self._device = V4L2Device.from_id(device_id)
+        self._device.open()
+        width, height = STREAM_RESOLUTION
+        self._device.video_capture.set_format(width, height, "MJPG")
+        self._frames = iter(self._device)
+
+    def _discard_queued(self) -> None:
+        # While nobody reads, the driver fills its buffers and then stops, so whatever
+        # is queued may be minutes old. Throw those away before taking a live frame.
+        for _ in range(STREAM_MAX_STALE):
+            ready, _, _ = select.select([self._device.fileno()], [], [], 0)
+            if not ready:
+                break
+            next(self._frames)
+
+    def read(self) -> bytes:
+        self._discard_queued()
+        data = bytes(next(self._frames))
+        if not data:
+            raise RuntimeError("V4L2 stream returned an empty frame.")
+        return data
+
+    def close(self) -> None:
+        self._frames.close()
+        self._device.close()
+
+
+def _open_stream() -> "_VideoStream":
+    errors = []
+    for device in STREAM_DEVICES:
+        try:
+            return _VideoStream(device)
+        except Exception as exc:  # noqa: B902
+            errors.append(f"/dev/video{device}: {exc}")
+    raise RuntimeError("; ".join(errors))
+
+
+def _acquire_camera() -> None:
+    """Take the cross-process camera flock, waiting up to CAMERA_LOCK_TIMEOUT for another worker."""
+    global _camera_lock_file
+    if fcntl is None or _camera_lock_file is not None:
+        return
+
+    CAMERA_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    file = open(CAMERA_LOCK_PATH, "a")
+    deadline = time.monotonic() + CAMERA_LOCK_TIMEOUT
+    while True:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                file.close()
+                raise RuntimeError("Camera is busy in another worker process.")
+            time.sleep(0.05)
+    _camera_lock_file = file
+
+
+def _release_camera() -> None:
+    global _camera_lock_file
+    if _camera_lock_file is not None:
+        _camera_lock_file.close()  # closing drops the flock
+        _camera_lock_file = None
+
+
+def _close_stream() -> None:
+    """Close the warm stream and hand the camera back to other workers. Caller holds _camera_lock."""
+    global _video_stream, _video_stream_timer
+    if _video_stream_timer is not None:
+        _video_stream_timer.cancel()
+        _video_stream_timer = None
+    if _video_stream is not None:
+        try:
+            _video_stream.close()
+        except Exception:  # noqa: B902
+            pass
+        _video_stream = None
+    _release_camera()
+
+
+def _close_idle_stream() -> None:
+    with _camera_lock:
+        _close_stream()
+
+
+def _capture_with_stream() -> bytes:
+    global _video_stream, _video_stream_timer
+    if V4L2Device is None:
+        raise RuntimeError("v4l2py is not installed.")
+
+    # Caller holds _camera_lock and the camera flock.
+    if _video_stream_timer is not None:
+        _video_stream_timer.cancel()
+    try:
+        if _video_stream is None:
+            _video_stream = _open_stream()
+        data = _video_stream.read()
+    except Exception as exc:  # noqa: B902
+        # Drop the stream so the next capture reopens it (or falls back to the slower paths).
+        _close_stream()
+        raise RuntimeError(f"V4L2 stream: {exc}")
+
+    _video_stream_timer = threading.Timer(STREAM_IDLE_TIMEOUT, _close_idle_stream)
+    _video_stream_timer.daemon = True
+    _video_stream_timer.start()
+    return data
+
+
+def _grab_webcam_frame() -> np.ndarray:
     errors = []
     for device in (0, 1):
         camera = cv2.VideoCapture(device)
@@ -148,11 +549,7 @@ def _capture_with_webcam() -> bytes:
             errors.append(f"USB webcam on /dev/video{device} returned a black frame. Check lighting/cover.")
             continue
 
-        ok, encoded = cv2.imencode(".jpg", chosen_frame)
-        if not ok:
-            errors.append(f"Failed to encode captured frame from /dev/video{device}.")
-            continue
-        return encoded.tobytes()
+        return chosen_frame
 
     raise RuntimeError("; ".join(errors) if errors else "No USB webcam detected.")
 
@@ -188,44 +585,50 @@ def _capture_with_fswebcam() -> bytes:
     raise RuntimeError("; ".join(errors) if errors else "fswebcam could not capture on any device")
 
 
-def capture_frame() -> bytes:
-    errors = []
+def _capture_with_rpicam() -> bytes:
     rpicam = shutil.which("rpicam-still")
-    if rpicam:
-        temp_path = Path(tempfile.gettempdir()) / "rpicam_capture.jpg"
-        cmd = [rpicam, "-o", str(temp_path), "-t", "1000"]
-        try:
-            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
-            if proc.returncode == 0 and temp_path.exists():
-                data = temp_path.read_bytes()
-                temp_path.unlink(missing_ok=True)
-                if not data:
-                    errors.append("rpicam-still produced an empty file.")
-                else:
-                    return data
-            else:
-                err_msg = proc.stderr.decode().strip() or "rpicam-still failed with unknown error"
-                errors.append(err_msg)
-        except subprocess.TimeoutExpired:
-            errors.append("rpicam-still timed out after 10 seconds")
-        except Exception as exc:  # noqa: B902
-            errors.append(f"rpicam-still error: {exc}")
-        finally:
-            temp_path.unlink(missing_ok=True)
+    if not rpicam:
+        raise RuntimeError("rpicam-still is not installed.")
 
+    temp_path = Path(tempfile.gettempdir()) / "rpicam_capture.jpg"
+    cmd = [rpicam, "-o", str(temp_path), "-t", "1000"]
     try:
-        return _capture_with_fswebcam()
-    except Exception as exc:  # noqa: B902
-        errors.append(str(exc))
-
-    try:
-        return _capture_with_webcam()
-    except Exception as exc:  # noqa: B902
-        errors.append(str(exc))
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+        if proc.returncode != 0 or not temp_path.exists():
+            raise RuntimeError(proc.stderr.decode().strip() or "rpicam-still failed with unknown error")
+        data = temp_path.read_bytes()
+        if not data:
+            raise RuntimeError("rpicam-still produced an empty file.")
+        return data
+    except subprocess.TimeoutExpired:
+        raise RuntimeError("rpicam-still timed out after 10 seconds")
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def _first_capture(attempts: List[Callable]):
+    errors = []
+    with _camera_lock:
+        _acquire_camera()
+        try:
+            for attempt in attempts:
+                try:
+                    return attempt()
+                except Exception as exc:  # noqa: B902
+                    errors.append(str(exc))
+        finally:
+            if _video_stream is None:
+                _release_camera()  # only the warm stream keeps the camera between captures
 
+    cache.delete(CAMERA_PROBE_KEY)
     raise RuntimeError("No camera could capture a frame. Attempts: " + "; ".join(errors))
 
 
-def as_data_uri(image_bytes: bytes) -> str:
-    encoded = base64.b64encode(image_bytes).decode("ascii")
-    return f"data:image/jpeg;base64,{encoded}"
+def capture_frame_array() -> np.ndarray:
+    """Capture a BGR frame from the first camera that responds; webcam frames skip the JPEG round-trip."""
+    return _first_capture([
+        lambda: _decode_image(_capture_with_stream()),
+        lambda: _decode_image(_capture_with_rpicam()),
+        lambda: _decode_image(_capture_with_fswebcam()),
+        _grab_webcam_frame,
+    ])